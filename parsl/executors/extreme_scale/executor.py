@@ -78,7 +78,7 @@ class ExtremeScaleExecutor(HighThroughputExecutor, RepresentationMixin):
     launch_cmd : str
         Command line string to launch the mpi_worker_pool from the provider.
         The command line string will be formatted with appropriate values for the following values (debug, task_url, result_url,
-        ranks_per_node, nodes_per_block, heartbeat_period ,heartbeat_threshold, logdir). For example:
+        ranks_per_node, nodes_per_block, heartbeat_period ,heartbeat_threshold, logdir, worker_prefetch). For example:
         launch_cmd="mpiexec -np {ranks_per_node} mpi_worker_pool.py {debug} --task_url={task_url} --result_url={result_url}"
 
     address : string
@@ -118,6 +118,12 @@ class ExtremeScaleExecutor(HighThroughputExecutor, RepresentationMixin):
         Number of seconds after which a heartbeat message indicating liveness is sent to the
         counterpart (interchange, manager). Default:30s
 
+    worker_prefetch : Bool
+        Whether each MPI worker requests its next task before running the current one, so that
+        sending the next task overlaps with running the current one. A prefetched task waits for
+        its worker even when another worker becomes free first. Add {worker_prefetch} to a
+        custom launch_cmd for this option to take effect. Default: False
+
     """
 
     def __init__(self,
@@ -134,6 +140,7 @@ class ExtremeScaleExecutor(HighThroughputExecutor, RepresentationMixin):
                  ranks_per_node=1,
                  heartbeat_threshold=120,
                  heartbeat_period=30,
+                 worker_prefetch=False,
                  managed=True):
 
         super().__init__(label=label,
@@ -151,6 +158,7 @@ class ExtremeScaleExecutor(HighThroughputExecutor, RepresentationMixin):
                          managed=managed)
 
         self.ranks_per_node = ranks_per_node
+        self.worker_prefetch = worker_prefetch
 
         logger.debug("Initializing ExtremeScaleExecutor")
 
@@ -161,7 +169,8 @@ class ExtremeScaleExecutor(HighThroughputExecutor, RepresentationMixin):
                                "--result_url={result_url} "
                                "--logdir={logdir} "
                                "--hb_period={heartbeat_period} "
-                               "--hb_threshold={heartbeat_threshold} ")
+                               "--hb_threshold={heartbeat_threshold} "
+                               "{worker_prefetch} ")
         self.worker_debug = worker_debug
 
     def start(self):
@@ -176,6 +185,7 @@ class ExtremeScaleExecutor(HighThroughputExecutor, RepresentationMixin):
     def initialize_scaling(self):
 
         debug_opts = "--debug" if self.worker_debug else ""
+        prefetch_opts = "--worker_prefetch" if self.worker_prefetch else ""
         l_cmd = self.launch_cmd.format(debug=debug_opts,
                                        task_url="tcp://{}:{}".format(self.address,
                                                                      self.worker_task_port),
@@ -187,6 +197,7 @@ class ExtremeScaleExecutor(HighThroughputExecutor, RepresentationMixin):
                                        nodes_per_block=self.provider.nodes_per_block,
                                        heartbeat_period=self.heartbeat_period,
                                        heartbeat_threshold=self.heartbeat_threshold,
+                                       worker_prefetch=prefetch_opts,
                                        logdir="{}/{}".format(self.run_dir, self.label))
         self.launch_cmd = l_cmd
         logger.debug("Launch command: {}".format(self.launch_cmd))
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
+import io
 import logging
 import os
 import sys
@@ -10,16 +11,20 @@ import threading
 import pickle
 import time
 import datetime
-import queue
 import uuid
 import zmq
 import json
+from collections import deque
 
-from mpi4py import MPI
+import mpi4py
+# Only the main thread of each rank makes MPI calls, so MPI need not lock
+# internally for calls from other threads
+mpi4py.rc.thread_level = 'funneled'
+from mpi4py import MPI  # noqa: E402
 
 from parsl.app.errors import RemoteExceptionWrapper
 from parsl.version import VERSION as PARSL_VERSION
-from ipyparallel.serialize import unpack_apply_message  # pack_apply_message,
+from parsl.executors.serialize import unpack_task
 from ipyparallel.serialize import serialize_object
 
 RESULT_TAG = 10
@@ -28,6 +33,14 @@ TASK_REQUEST_TAG = 11
 LOOP_SLOWDOWN = 0.0  # in seconds
 
 HEARTBEAT_CODE = (2 ** 32) - 1
+HEARTBEAT_MSG = (HEARTBEAT_CODE).to_bytes(4, "little")
+
+# Workers send this as a raw buffer to ask the manager for a task
+TASK_REQUEST = b'TREQ'
+
+# Kind bytes which follow the task id in result messages
+RESULT_KIND = b'r'
+EXCEPTION_KIND = b'e'
 
 
 class Manager(object):
@@ -37,6 +50,18 @@ class Manager(object):
     2. Make batched requests from to the interchange for tasks
     3. Receive and distribute tasks to workers
     4. Act as a proxy to the Interchange for results.
+
+    MPI is initialized at the funneled thread level, so all MPI calls must be made
+    from the main thread. The pull_tasks and push_results threads only use ZMQ and
+    the internal queues, and must never call self.comm.
+
+    Each internal queue has a single producer and a single consumer:
+
+    * pending_task_queue: filled by pull_tasks, drained by the main thread
+    * the result inbox: an inproc ZMQ pair, written by the main thread and read
+      by push_results
+    * ready_worker_queue: filled and drained by the main thread; pull_tasks only
+      reads its length
     """
     def __init__(self,
                  comm, rank,
@@ -45,6 +70,7 @@ class Manager(object):
                  max_queue_size=10,
                  heartbeat_threshold=120,
                  heartbeat_period=30,
+                 worker_prefetch=False,
                  uid=None):
         """
         Parameters
@@ -59,6 +85,10 @@ class Manager(object):
         heartbeat_period : int
              Number of seconds after which a heartbeat message is sent to the interchange
 
+        worker_prefetch : bool
+             Whether workers request their next task before running the current one,
+             so that each worker can hold one task beyond the one it is running
+
         """
         self.uid = uid
 
@@ -75,14 +105,27 @@ class Manager(object):
         self.result_outgoing.setsockopt(zmq.LINGER, 0)
         self.result_outgoing.connect(result_q_url)
 
+        # Results are handed from the main thread to push_results over an inproc pair,
+        # so that push_results can block until there is something to send. Like the
+        # queue it replaces, the pair is unbounded, so the main thread never blocks on it.
+        inbox_url = "inproc://results-{}".format(uuid.uuid4().hex)
+        self.result_inbox = self.context.socket(zmq.PAIR)
+        self.result_inbox.set_hwm(0)
+        self.result_inbox.setsockopt(zmq.LINGER, 0)
+        self.result_inbox.bind(inbox_url)
+        self.result_sender = self.context.socket(zmq.PAIR)
+        self.result_sender.set_hwm(0)
+        self.result_sender.setsockopt(zmq.LINGER, 0)
+        self.result_sender.connect(inbox_url)
+
         logger.info("Manager connected")
         self.max_queue_size = max_queue_size + comm.size
 
-        # Creating larger queues to avoid queues blocking
-        # These can be updated after queue limits are better understood
-        self.pending_task_queue = queue.Queue()
-        self.pending_result_queue = queue.Queue()
-        self.ready_worker_queue = queue.Queue()
+        # Each of these queues has a single producer thread and a single consumer thread.
+        # deque.append and deque.popleft are atomic, so unlike queue.Queue they hand
+        # items over without taking a lock.
+        self.pending_task_queue = deque()
+        self.ready_worker_queue = deque()
 
         self.tasks_per_round = 1
 
@@ -90,10 +133,26 @@ class Manager(object):
         self.heartbeat_threshold = heartbeat_threshold
         self.comm = comm
         self.rank = rank
+        # Read here, because the registration message is built on the task puller thread
+        self.worker_count = comm.size - 1
+
+        # A persistent receive is kept posted for each worker's task requests, so that
+        # they are matched on arrival, by source, rather than searched for with
+        # wildcard probes. Request i receives from worker rank i + 1.
+        self._task_request_bufs = [bytearray(len(TASK_REQUEST)) for _ in range(self.worker_count)]
+        self._task_request_reqs = [comm.Recv_init([buf, MPI.BYTE], source=i + 1, tag=TASK_REQUEST_TAG)
+                                   for i, buf in enumerate(self._task_request_bufs)]
+        MPI.Prequest.Startall(self._task_request_reqs)
+
+        # Status of the last matched probe on the main thread. Each probe overwrites
+        # all of its fields, so one object serves for the life of the manager.
+        self._status = MPI.Status()
+        self.worker_prefetch = worker_prefetch
 
     def create_reg_message(self):
         """ Creates a registration message to identify the worker to the interchange
         """
+        prefetch_capacity = self.worker_count if self.worker_prefetch else 0
         msg = {'parsl_v': PARSL_VERSION,
                'python_v': "{}.{}.{}".format(sys.version_info.major,
                                              sys.version_info.minor,
@@ -101,9 +160,9 @@ class Manager(object):
                'os': platform.system(),
                'hostname': platform.node(),
                'dir': os.getcwd(),
-               'prefetch_capacity': 0,
-               'worker_count': (self.comm.size - 1),
-               'max_capacity': (self.comm.size - 1) + 0,  # (+prefetch)
+               'prefetch_capacity': prefetch_capacity,
+               'worker_count': self.worker_count,
+               'max_capacity': self.worker_count + prefetch_capacity,
                'reg_time': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         }
         b_msg = json.dumps(msg).encode('utf-8')
@@ -112,34 +171,50 @@ class Manager(object):
     def heartbeat(self):
         """ Send heartbeat to the incoming task queue
         """
-        heartbeat = (HEARTBEAT_CODE).to_bytes(4, "little")
-        r = self.task_incoming.send(heartbeat)
-        logger.debug("Return from heartbeat : {}".format(r))
+        r = self.task_incoming.send(HEARTBEAT_MSG)
+        logger.debug("Return from heartbeat : %s", r)
 
-    def recv_result_from_workers(self):
+    def recv_result_from_workers(self, message, info):
         """ Receives a results from the MPI worker pool and send it out via 0mq
 
+        Results are sent as raw bytes rather than pickled by mpi4py, so they are
+        received into a buffer of the size reported by the probe.
+
+        Parameters:
+        -----------
+        message : MPI.Message
+              Result message matched by improbe
+        info : MPI.Status
+              Status filled in by the improbe
+
         Returns:
         --------
             result: task result from the workers
         """
-        info = MPI.Status()
-        result = self.comm.recv(source=MPI.ANY_SOURCE, tag=RESULT_TAG, status=info)
-        logger.debug("Received result from workers: {}".format(result))
+        result = bytearray(info.Get_count(MPI.BYTE))
+        message.Recv([result, MPI.BYTE])
+        logger.debug("Received result from workers: %s", result)
         return result
 
-    def recv_task_request_from_workers(self):
-        """ Receives 1 task request from MPI comm
+    def recv_task_requests_from_workers(self):
+        """ Collects the task requests which have arrived from the workers
+
+        Each completed persistent receive is restarted, ready for the next request
+        from the same worker.
 
         Returns:
         --------
-            worker_rank: worker_rank id
+            worker_ranks: list of the ranks of workers that requested a task
         """
-        info = MPI.Status()
-        comm.recv(source=MPI.ANY_SOURCE, tag=TASK_REQUEST_TAG, status=info)
-        worker_rank = info.Get_source()
-        logger.info("Received task request from worker:{}".format(worker_rank))
-        return worker_rank
+        completed = MPI.Prequest.Testsome(self._task_request_reqs)
+        if not completed:
+            return []
+        worker_ranks = []
+        for i in completed:
+            self._task_request_reqs[i].Start()
+            worker_ranks.append(i + 1)
+        logger.info("Received task requests from workers:%s", worker_ranks)
+        return worker_ranks
 
     def pull_tasks(self, kill_event):
         """ Pulls tasks from the incoming tasks 0mq pipe onto the internal
@@ -151,14 +226,12 @@ class Manager(object):
               Event to let the thread know when it is time to die.
         """
         logger.info("[TASK PULL THREAD] starting")
-        poller = zmq.Poller()
-        poller.register(self.task_incoming, zmq.POLLIN)
 
         # Send a registration message
         msg = self.create_reg_message()
         logger.debug("Sending registration message: {}".format(msg))
         self.task_incoming.send(msg)
-        last_beat = time.time()
+        next_beat = time.time() + self.heartbeat_period
         last_interchange_contact = time.time()
         task_recv_counter = 0
 
@@ -166,49 +239,57 @@ class Manager(object):
 
         while not kill_event.is_set():
             time.sleep(LOOP_SLOWDOWN)
-            ready_worker_count = self.ready_worker_queue.qsize()
-            pending_task_count = self.pending_task_queue.qsize()
+            ready_worker_count = len(self.ready_worker_queue)
+            pending_task_count = len(self.pending_task_queue)
 
-            logger.debug("[TASK_PULL_THREAD] ready workers:{}, pending tasks:{}".format(ready_worker_count,
-                                                                                        pending_task_count))
+            logger.debug("[TASK_PULL_THREAD] ready workers:%s, pending tasks:%s", ready_worker_count,
+                         pending_task_count)
 
-            if time.time() > last_beat + self.heartbeat_period:
+            now = time.time()
+            if now >= next_beat:
                 self.heartbeat()
-                last_beat = time.time()
+                next_beat = now + self.heartbeat_period
 
             if pending_task_count < self.max_queue_size and ready_worker_count > 0:
-                logger.debug("[TASK_PULL_THREAD] Requesting tasks: {}".format(ready_worker_count))
+                logger.debug("[TASK_PULL_THREAD] Requesting tasks: %s", ready_worker_count)
                 msg = ((ready_worker_count).to_bytes(4, "little"))
                 self.task_incoming.send(msg)
 
-            socks = dict(poller.poll(timeout=poll_timer))
-
-            if self.task_incoming in socks and socks[self.task_incoming] == zmq.POLLIN:
-                _, pkl_msg = self.task_incoming.recv_multipart()
-                tasks = pickle.loads(pkl_msg)
+            # Only one socket is waited on, so poll it directly rather than through a
+            # zmq.Poller, which builds a new poll set and result dict on every call.
+            # The wait is cut short when the next heartbeat falls due, so heartbeats
+            # go out on time rather than up to a whole poll_timer late.
+            if self.task_incoming.poll(timeout=max(0, min(poll_timer, int((next_beat - now) * 1000)))):
                 last_interchange_contact = time.time()
 
-                if tasks == 'STOP':
-                    logger.critical("[TASK_PULL_THREAD] Received stop request")
-                    kill_event.set()
-                    break
+                # Take every message which has already arrived before waiting again
+                while self.task_incoming.getsockopt(zmq.EVENTS) & zmq.POLLIN:
+                    _, pkl_msg = self.task_incoming.recv_multipart(zmq.NOBLOCK)
+                    tasks = pickle.loads(pkl_msg)
 
-                elif tasks == HEARTBEAT_CODE:
-                    logger.debug("Got heartbeat from interchange")
+                    if tasks == 'STOP':
+                        logger.critical("[TASK_PULL_THREAD] Received stop request")
+                        kill_event.set()
+                        break
 
-                else:
-                    # Reset timer on receiving message
-                    poll_timer = 1
-                    task_recv_counter += len(tasks)
-                    logger.debug("[TASK_PULL_THREAD] Got tasks: {} of {}".format([t['task_id'] for t in tasks],
-                                                                                 task_recv_counter))
-                    for task in tasks:
-                        self.pending_task_queue.put(task)
+                    elif tasks == HEARTBEAT_CODE:
+                        logger.debug("Got heartbeat from interchange")
+
+                    else:
+                        # Busy-poll while tasks keep arriving
+                        poll_timer = 0
+                        task_recv_counter += len(tasks)
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("[TASK_PULL_THREAD] Got tasks: %s of %s", [tid for tid, _ in tasks],
+                                         task_recv_counter)
+                        # One extend hands over the whole batch, however many tasks it holds
+                        self.pending_task_queue.extend(tasks)
             else:
                 logger.debug("[TASK_PULL_THREAD] No incoming tasks")
-                # Limit poll duration to heartbeat_period
+                # Back off from busy-polling to blocking waits of doubling length,
+                # limited to heartbeat_period
                 # heartbeat_period is in s vs poll_timer in ms
-                poll_timer = min(self.heartbeat_period * 1000, poll_timer * 2)
+                poll_timer = min(self.heartbeat_period * 1000, max(1, poll_timer * 2))
 
                 # Only check if no messages were received.
                 if time.time() > last_interchange_contact + self.heartbeat_threshold:
@@ -217,39 +298,65 @@ class Manager(object):
                     logger.critical("[TASK_PULL_THREAD] Exiting")
                     break
 
-    def push_results(self, kill_event):
-        """ Listens on the pending_result_queue and sends out results via 0mq
+    def push_results(self):
+        """ Listens on the result inbox and sends out results via 0mq
 
-        Parameters:
-        -----------
-        kill_event : threading.Event
-              Event to let the thread know when it is time to die.
-        """
+        The thread blocks on the inbox until results arrive, and sends every result
+        which has arrived as one multipart message. An empty message is the stop
+        request, which the main thread sends after its last result.
 
-        # We set this timeout so that the thread checks the kill_event and does not
-        # block forever on the internal result queue
-        timeout = 0.1
-        # timer = time.time()
+        Results are passed along as zmq.Frames, so ZMQ forwards the buffers received
+        from the workers without copying them.
+        """
         logger.debug("[RESULT_PUSH_THREAD] Starting thread")
 
-        while not kill_event.is_set():
-            time.sleep(LOOP_SLOWDOWN)
+        stop = False
+        while not stop:
             try:
-                items = []
-                while not self.pending_result_queue.empty():
-                    r = self.pending_result_queue.get(block=True)
-                    items.append(r)
-                if items:
-                    self.result_outgoing.send_multipart(items)
+                items = [self.result_inbox.recv(copy=False)]
+                try:
+                    while True:
+                        items.append(self.result_inbox.recv(zmq.NOBLOCK, copy=False))
+                except zmq.Again:
+                    pass
+
+                if len(items[-1]) == 0:
+                    items.pop()
+                    stop = True
 
-            except queue.Empty:
-                logger.debug("[RESULT_PUSH_THREAD] No results to send in past {}seconds".format(timeout))
+                if items:
+                    self.result_outgoing.send_multipart(items, copy=False)
 
             except Exception as e:
                 logger.exception("[RESULT_PUSH_THREAD] Got an exception : {}".format(e))
 
         logger.critical("[RESULT_PUSH_THREAD] Exiting")
 
+    def release_requests(self, send_reqs):
+        """ Cancels and frees the MPI requests still outstanding at shutdown.
+
+        Parameters:
+        -----------
+        send_reqs : list of MPI.Request
+              Task sends which may not have completed yet.
+        """
+        send_reqs = [req for req in send_reqs if not req.Test()]
+        if send_reqs:
+            logger.warning("Cancelling %s task sends still in flight", len(send_reqs))
+        for req in send_reqs:
+            # A send can only be cancelled until the worker receives it, and the worker
+            # may never do so, so it is freed without waiting for the cancel to complete
+            req.Cancel()
+            req.Free()
+
+        # Unmatched receives are always cancelled, so waiting on them cannot block
+        for req in self._task_request_reqs:
+            req.Cancel()
+            req.Wait()
+            req.Free()
+        logger.debug("Released %s task request receives", len(self._task_request_reqs))
+        self._task_request_reqs = []
+
     def start(self):
         """ Start the Manager process.
 
@@ -268,8 +375,7 @@ class Manager(object):
         self._kill_event = threading.Event()
         self._task_puller_thread = threading.Thread(target=self.pull_tasks,
                                                     args=(self._kill_event,))
-        self._result_pusher_thread = threading.Thread(target=self.push_results,
-                                                      args=(self._kill_event,))
+        self._result_pusher_thread = threading.Thread(target=self.push_results)
         self._task_puller_thread.start()
         self._result_pusher_thread.start()
 
@@ -279,68 +385,95 @@ class Manager(object):
         task_recv_counter = 0
         task_sent_counter = 0
 
+        # When a round neither receives nor dispatches anything, the loop sleeps for
+        # this long before the next round, doubling up to idle_sleep_max. The first
+        # idle round only yields, so bursts of traffic are still picked up promptly.
+        idle_sleep_min = 0.0001
+        idle_sleep_max = 0.01
+        idle_sleep = 0
+
+        send_reqs = []
+
         logger.info("Loop start")
         while not self._kill_event.is_set():
             time.sleep(LOOP_SLOWDOWN)
 
-            # In this block we attempt to probe MPI for a set amount of time,
-            # and if we have exhausted all available MPI events, we move on
+            worker_ranks = self.recv_task_requests_from_workers()
+            self.ready_worker_queue.extend(worker_ranks)
+
+            # In this block we attempt to probe MPI for results for a set amount of
+            # time, and if we have exhausted all available results, we move on
             # to the next block. The timer and counter trigger balance
             # fairness and responsiveness.
             timer = time.time() + 0.05
-            counter = min(10, comm.size)
+            counter = 0
             while time.time() < timer:
-                info = MPI.Status()
-
-                if counter > 10:
+                if counter >= 10:
                     logger.debug("Hit max mpi events per round")
                     break
 
-                if not self.comm.Iprobe(status=info):
-                    logger.debug("Timer expired, processed {} mpi events".format(counter))
+                # A worker is waiting and a task is there for it, so dispatch now
+                # rather than keep probing for the rest of the window
+                if counter and self.ready_worker_queue and self.pending_task_queue:
                     break
-                else:
-                    tag = info.Get_tag()
-                    logger.info("Message with tag {} received".format(tag))
 
+                # A matched probe removes the message from MPI's matching queue, so it
+                # is received from the returned handle without being matched again.
+                message = self.comm.improbe(tag=RESULT_TAG, status=self._status)
+                if message is None:
+                    logger.debug("Timer expired, processed %s mpi events", counter)
+                    break
+                else:
                     counter += 1
-                    if tag == RESULT_TAG:
-                        result = self.recv_result_from_workers()
-                        self.pending_result_queue.put(result)
-                        result_counter += 1
-
-                    elif tag == TASK_REQUEST_TAG:
-                        worker_rank = self.recv_task_request_from_workers()
-                        self.ready_worker_queue.put(worker_rank)
-
-                    else:
-                        logger.error("Unknown tag {} - ignoring this message and continuing".format(tag))
-
-            available_worker_cnt = self.ready_worker_queue.qsize()
-            available_task_cnt = self.pending_task_queue.qsize()
-            logger.debug("[MAIN] Ready workers: {} Ready tasks: {}".format(available_worker_cnt,
-                                                                           available_task_cnt))
+                    result = self.recv_result_from_workers(message, self._status)
+                    # Each result has a buffer of its own, which is never reused,
+                    # so ZMQ can hold on to it rather than copy it
+                    self.result_sender.send(result, copy=False)
+                    result_counter += 1
+
+            available_worker_cnt = len(self.ready_worker_queue)
+            available_task_cnt = len(self.pending_task_queue)
+            logger.debug("[MAIN] Ready workers: %s Ready tasks: %s", available_worker_cnt,
+                         available_task_cnt)
             this_round = min(available_worker_cnt, available_task_cnt)
+            # Sends are not waited for. A worker which prefetches may still be running
+            # its previous task, and waiting on a large send to it would stall the loop.
+            # Sends still in flight are tested each round instead, and dropped once done.
+            send_reqs = [req for req in send_reqs if not req.Test()]
             for i in range(this_round):
-                worker_rank = self.ready_worker_queue.get()
-                task = self.pending_task_queue.get()
-                comm.send(task, dest=worker_rank, tag=worker_rank)
+                worker_rank = self.ready_worker_queue.popleft()
+                task = self.pending_task_queue.popleft()
+                # Tasks are pickled here and sent as raw bytes, so that workers can
+                # receive them into a reusable buffer
+                task_buf = pickle.dumps(task, protocol=pickle.HIGHEST_PROTOCOL)
+                send_reqs.append(self.comm.Isend([task_buf, MPI.BYTE], dest=worker_rank, tag=worker_rank))
                 task_sent_counter += 1
-                logger.debug("Assigning worker:{} task:{}".format(worker_rank, task['task_id']))
+                logger.debug("Assigning worker:%s task:%s", worker_rank, task[0])
+
+            if worker_ranks or counter or this_round:
+                idle_sleep = 0
+            else:
+                time.sleep(idle_sleep)
+                idle_sleep = min(max(idle_sleep * 2, idle_sleep_min), idle_sleep_max)
 
             if not start:
                 start = time.time()
 
-            logger.debug("Tasks recvd:{} Tasks dispatched:{} Results recvd:{}".format(
-                task_recv_counter, task_sent_counter, result_counter))
+            logger.debug("Tasks recvd:%s Tasks dispatched:%s Results recvd:%s",
+                         task_recv_counter, task_sent_counter, result_counter)
             # print("[{}] Received: {}".format(self.identity, msg))
             # time.sleep(random.randint(4,10)/10)
 
+        self.release_requests(send_reqs)
+
+        self.result_sender.send(b'')
         self._task_puller_thread.join()
         self._result_pusher_thread.join()
 
         self.task_incoming.close()
         self.result_outgoing.close()
+        self.result_sender.close()
+        self.result_inbox.close()
         self.context.term()
 
         delta = time.time() - start
@@ -355,64 +488,83 @@ def execute_task(bufs):
     user_ns = locals()
     user_ns.update({'__builtins__': __builtins__})
 
-    f, args, kwargs = unpack_apply_message(bufs, user_ns, copy=False)
-
-    fname = getattr(f, '__name__', 'f')
-    prefix = "parsl_"
-    fname = prefix + "f"
-    argname = prefix + "args"
-    kwargname = prefix + "kwargs"
-    resultname = prefix + "result"
-
-    user_ns.update({fname: f,
-                    argname: args,
-                    kwargname: kwargs,
-                    resultname: resultname})
-
-    code = "{0} = {1}(*{2}, **{3})".format(resultname, fname,
-                                           argname, kwargname)
+    # user_ns becomes the globals of the unpacked function
+    f, args, kwargs = unpack_task(bufs, user_ns)
 
+    # Call the function directly, rather than compiling and exec-ing a call
+    # statement for every task
     try:
-        logger.debug("[RUNNER] Executing: {0}".format(code))
-        exec(code, user_ns, user_ns)
+        logger.debug("[RUNNER] Executing: %s", getattr(f, '__name__', 'f'))
+        result = f(*args, **kwargs)
 
     except Exception as e:
         logger.warning("Caught exception; will raise it: {}".format(e))
         raise e
 
     else:
-        logger.debug("[RUNNER] Result: {0}".format(user_ns.get(resultname)))
-        return user_ns.get(resultname)
+        logger.debug("[RUNNER] Result: %s", result)
+        return result
+
 
+def worker(comm, rank, prefetch=False):
+    """ Runs tasks sent by the manager on rank 0, requesting one task at a time.
 
-def worker(comm, rank):
+    With prefetch, the worker requests its next task before running the current one,
+    so that the next task is already on its way while the current one runs.
+    """
     logger.info("Worker started")
 
     # Sync worker with master
     comm.Barrier()
     logger.debug("Synced")
 
-    task_request = b'TREQ'
+    # Tasks are received into one buffer, which is replaced only when a larger task arrives
+    task_buf = bytearray(2 ** 20)
+    info = MPI.Status()
+    # Result packages are written into one buffer, which is overwritten from the start
+    # for every task rather than reallocated
+    result_buf = io.BytesIO()
 
+    comm.Send([TASK_REQUEST, MPI.BYTE], dest=0, tag=TASK_REQUEST_TAG)
     while True:
-        comm.send(task_request, dest=0, tag=TASK_REQUEST_TAG)
-        # The worker will receive {'task_id':<tid>, 'buffer':<buf>}
-        req = comm.recv(source=0, tag=rank)
-        logger.debug("Got req: {}".format(req))
-        tid = req['task_id']
-        logger.debug("Got task: {}".format(tid))
+        # The worker will receive (<task_id>, <buffers>)
+        message = comm.mprobe(source=0, tag=rank, status=info)
+        task_size = info.Get_count(MPI.BYTE)
+        if task_size > len(task_buf):
+            task_buf = bytearray(task_size)
+        message.Recv([task_buf, MPI.BYTE])
+        req = pickle.loads(memoryview(task_buf)[:task_size])
+        logger.debug("Got req: %s", req)
+        tid, bufs = req
+        logger.debug("Got task: %s", tid)
+
+        if prefetch:
+            comm.Send([TASK_REQUEST, MPI.BYTE], dest=0, tag=TASK_REQUEST_TAG)
 
         try:
-            result = execute_task(req['buffer'])
+            result = execute_task(bufs)
         except Exception as e:
-            result_package = {'task_id': tid, 'exception': serialize_object(RemoteExceptionWrapper(*sys.exc_info()))}
-            logger.debug("No result due to exception: {} with result package {}".format(e, result_package))
+            kind = EXCEPTION_KIND
+            result_package = serialize_object(RemoteExceptionWrapper(*sys.exc_info()))
+            logger.debug("No result due to exception: %s with result package %s", e, result_package)
         else:
-            result_package = {'task_id': tid, 'result': serialize_object(result)}
-            logger.debug("Result: {}".format(result))
+            kind = RESULT_KIND
+            result_package = serialize_object(result)
+            logger.debug("Result: %s", result)
+
+        # The task id prefix lets the interchange route the result without unpickling it
+        result_buf.seek(0)
+        result_buf.write(tid.to_bytes(8, 'little', signed=True))
+        result_buf.write(kind)
+        pickle.dump(result_package, result_buf)
+        # The package is already bytes, so send it as a raw buffer rather than have
+        # mpi4py pickle it a second time. Bytes past the end of this package are
+        # left over from larger earlier ones, and are not sent.
+        with result_buf.getbuffer() as package:
+            comm.Send([package, result_buf.tell(), MPI.BYTE], dest=0, tag=RESULT_TAG)
 
-        pkl_package = pickle.dumps(result_package)
-        comm.send(pkl_package, dest=0, tag=RESULT_TAG)
+        if not prefetch:
+            comm.Send([TASK_REQUEST, MPI.BYTE], dest=0, tag=TASK_REQUEST_TAG)
 
 
 def start_file_logger(filename, rank, name='parsl', level=logging.DEBUG, format_string=None):
@@ -432,7 +584,9 @@ def start_file_logger(filename, rank, name='parsl', level=logging.DEBUG, format_
 
     global logger
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    # The file handler is the only handler, so the logger drops records below its
+    # level before any message is formatted
+    logger.setLevel(level)
     handler = logging.FileHandler(filename)
     handler.setLevel(level)
     formatter = logging.Formatter(format_string, datefmt='%Y-%m-%d %H:%M:%S')
@@ -482,12 +636,16 @@ if __name__ == "__main__":
                         help="Heartbeat threshold in seconds. Uses manager default unless set")
     parser.add_argument("-r", "--result_url", required=True,
                         help="REQUIRED: ZMQ url for posting results")
+    parser.add_argument("--worker_prefetch", action='store_true',
+                        help="Workers request their next task before running the current one")
 
     args = parser.parse_args()
 
     comm = MPI.COMM_WORLD
     rank = comm.Get_rank()
     print("Starting rank: {}".format(rank))
+    if MPI.Query_thread() < MPI.THREAD_FUNNELED:
+        print("MPI only provides thread level {}, but the manager uses threads".format(MPI.Query_thread()))
 
     os.makedirs(args.logdir, exist_ok=True)
 
@@ -505,7 +663,8 @@ if __name__ == "__main__":
                               result_q_url=args.result_url,
                               uid=args.uid,
                               heartbeat_threshold=int(args.hb_threshold),
-                              heartbeat_period=int(args.hb_period))
+                              heartbeat_period=int(args.hb_period),
+                              worker_prefetch=args.worker_prefetch)
             manager.start()
             logger.debug("Finalizing MPI Comm")
             comm.Abort()
@@ -513,7 +672,7 @@ if __name__ == "__main__":
             start_file_logger('{}/worker.mpi_rank_{}.log'.format(args.logdir, rank),
                               rank,
                               level=logging.DEBUG if args.debug is True else logging.INFO)
-            worker(comm, rank)
+            worker(comm, rank, prefetch=args.worker_prefetch)
     except Exception as e:
         logger.critical("mpi_worker_pool exiting from an exception")
         logger.exception("Caught error: {}".format(e))
@@ -2,16 +2,22 @@ from concurrent.futures import Future
 import typeguard
 import logging
 import threading
-import queue
 import pickle
-from multiprocessing import Process, Queue
+import time
+import itertools
+import types
+import weakref
+from collections import deque
+from multiprocessing import Process, Pipe
 from typing import Dict, List, Optional, Tuple, Union
 import math
+import platform
+import zmq
 
-from ipyparallel.serialize import pack_apply_message
 from ipyparallel.serialize import deserialize_object
 
 from parsl.app.errors import RemoteExceptionWrapper
+from parsl.executors.serialize import pack_function, pack_task
 from parsl.executors.high_throughput import zmq_pipes
 from parsl.executors.high_throughput import interchange
 from parsl.executors.errors import BadMessage, ScalingFailed, DeserializationError
@@ -28,6 +34,88 @@ logger = logging.getLogger(__name__)
 BUFFER_THRESHOLD = 1024 * 1024
 ITEM_THRESHOLD = 1024
 
+# How deeply nested closures may be before their serialized form is not cached
+MAX_CLOSURE_DEPTH = 4
+
+
+def _function_snapshot(func, depth=0):
+    """Returns a snapshot of the state pack_function captures along with the code
+    of func, or None if that state may be mutable and func must be repacked on
+    every submission.
+
+    Plain functions without default arguments have an empty snapshot. Closures
+    are only snapshotted when every cell holds such a function in turn, as with
+    the wrappers the DFK puts around apps. Snapshots compare equal as long as no
+    cell has been rebound.
+    """
+    if type(func) is not types.FunctionType:
+        return None
+    if func.__defaults__ is not None or func.__kwdefaults__ is not None:
+        return None
+    if func.__closure__ is None:
+        return ()
+    if depth >= MAX_CLOSURE_DEPTH:
+        return None
+
+    snapshot = []
+    for cell in func.__closure__:
+        try:
+            contents = cell.cell_contents
+        except ValueError:
+            # Empty cell
+            return None
+        inner = _function_snapshot(contents, depth + 1)
+        if inner is None:
+            return None
+        snapshot.append((contents, inner))
+    return tuple(snapshot)
+
+
+class LazyResultFuture(Future):
+    """A Future which holds its result in serialized form until it is asked for.
+
+    Deserializing a result is left to the first caller of ``result`` or
+    ``exception``, rather than being done by the queue management thread as each
+    result arrives. Results which are never collected are never deserialized.
+    A result which fails to deserialize is reported as a DeserializationError,
+    by ``exception`` as well as ``result``.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._serialized_result = None
+        self._deserialized_result = None
+        self._deserialization_error = None
+        self._deserialize_lock = threading.Lock()
+
+    def set_serialized_result(self, serialized_result):
+        """Marks the future as done, with a result as produced by ``serialize_object``."""
+        self._serialized_result = serialized_result
+        self.set_result(None)
+
+    def _deserialize(self):
+        with self._deserialize_lock:
+            if self._serialized_result is not None:
+                try:
+                    self._deserialized_result, _ = deserialize_object(self._serialized_result)
+                except Exception as e:
+                    self._deserialization_error = DeserializationError(e)
+                self._serialized_result = None
+
+    def result(self, timeout=None):
+        super().result(timeout=timeout)
+        self._deserialize()
+        if self._deserialization_error is not None:
+            raise self._deserialization_error
+        return self._deserialized_result
+
+    def exception(self, timeout=None):
+        e = super().exception(timeout=timeout)
+        if e is not None:
+            return e
+        self._deserialize()
+        return self._deserialization_error
+
 
 class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
     """Executor designed for cluster-scale
@@ -149,6 +237,23 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
         Timeout period to be used by the executor components in milliseconds. Increasing poll_periods
         trades performance for cpu efficiency. Default: 10ms
 
+    batch_size : int
+        Maximum number of tasks sent to the interchange in a single message. Tasks submitted
+        while an earlier batch is being sent are grouped into the next one. Default: 256
+
+    batch_period : int
+        Time in milliseconds to wait for more tasks to be submitted before sending a batch.
+        Increasing batch_period trades task latency for fewer, larger messages. Default: 0ms
+
+    zmq_io_threads : int
+        Number of ZMQ I/O threads used for the task and result pipes between the executor and
+        the interchange. Raising this can help when very large volumes of task data are moved
+        through the executor. Default: 1
+
+    zmq_hwm : int
+        High water mark, in messages, of the task and result pipes between the executor and
+        the interchange. 0 means unbounded. Default: 0
+
     worker_logdir_root : string
         In case of a remote file system, specify the path to where logs will be kept.
     """
@@ -172,6 +277,10 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
                  heartbeat_threshold: int = 120,
                  heartbeat_period: int = 30,
                  poll_period: int = 10,
+                 batch_size: int = 256,
+                 batch_period: int = 0,
+                 zmq_io_threads: int = 1,
+                 zmq_hwm: int = 0,
                  suppress_failure: bool = True,
                  managed: bool = True,
                  worker_logdir_root: Optional[str] = None):
@@ -211,7 +320,8 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
         if self.workers_per_node == float('inf'):
             self.workers_per_node = 1  # our best guess-- we do not have any provider hints
 
-        self._task_counter = 0
+        # next() on a count is atomic, so task ids stay unique when several threads submit
+        self._task_counter = itertools.count(1)
         self.hub_address = None  # set to the correct hub address in dfk
         self.hub_port = None  # set to the correct hub port in dfk
         self.worker_ports = worker_ports
@@ -220,10 +330,21 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
         self.heartbeat_threshold = heartbeat_threshold
         self.heartbeat_period = heartbeat_period
         self.poll_period = poll_period
+        self.batch_size = batch_size
+        self.batch_period = batch_period
+        self.zmq_io_threads = zmq_io_threads
+        self.zmq_hwm = zmq_hwm
         self.suppress_failure = suppress_failure
         self.run_dir = '.'
         self.worker_logdir_root = worker_logdir_root
 
+        # Pickled functions, reused when the same function is submitted again
+        self._function_cache = weakref.WeakKeyDictionary()
+
+        # Tasks waiting to be sent to the interchange by the task flusher thread
+        self._pending_tasks = deque()
+        self._flush_event = threading.Event()
+
         if not launch_cmd:
             self.launch_cmd = ("process_worker_pool.py {debug} {max_workers} "
                                "-a {addresses} "
@@ -279,15 +400,30 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
     def start(self):
         """Create the Interchange process and connect to it.
         """
-        self.outgoing_q = zmq_pipes.TasksOutgoing("127.0.0.1", self.interchange_port_range)
-        self.incoming_q = zmq_pipes.ResultsIncoming("127.0.0.1", self.interchange_port_range)
-        self.command_client = zmq_pipes.CommandClient("127.0.0.1", self.interchange_port_range)
+        # The interchange always runs on this host, so wherever Unix domain sockets are
+        # available, the client channels skip the TCP stack. Their urls are then known
+        # before anything binds, which lets the interchange be forked first, while this
+        # process has no ZMQ context or executor threads for the child to inherit.
+        # TCP is used instead on Windows, or if the temp directory path is too long.
+        client_urls = (None, None, None)
+        if platform.system() != 'Windows':
+            client_urls = (zmq_pipes.ipc_url(), zmq_pipes.ipc_url(), zmq_pipes.ipc_url())
+
+        if all(client_urls):
+            self._start_local_queue_process(client_urls)
+            self._create_client_pipes(client_urls)
+        else:
+            self._create_client_pipes((None, None, None))
+            self._start_local_queue_process((self.outgoing_q.url,
+                                             self.incoming_q.url,
+                                             self.command_client.url))
 
         self.is_alive = True
 
         self._queue_management_thread = None
         self._start_queue_management_thread()
-        self._start_local_queue_process()
+        self._task_flusher_thread = None
+        self._start_task_flusher_thread()
 
         logger.debug("Created management thread: {}".format(self._queue_management_thread))
 
@@ -296,126 +432,173 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
     def _queue_management_worker(self):
         """Listen to the queue for task status messages and handle them.
 
-        Depending on the message, tasks will be updated with results, exceptions,
-        or updates. It expects the following messages:
+        Depending on the message, tasks will be updated with results or exceptions.
+        Each message is the task id as 8 little-endian bytes, a kind byte, and the
+        pickled list of buffers of the serialized object:
 
         .. code:: python
 
-            {
-               "task_id" : <task_id>
-               "result"  : serialized result object, if task succeeded
-               ... more tags could be added later
-            }
-
-            {
-               "task_id" : <task_id>
-               "exception" : serialized exception object, on failure
-            }
-
-        We do not support these yet, but they could be added easily.
-
-        .. code:: python
+            <task_id> + RESULT_KIND + pickle.dumps(<serialized result object>)
 
-            {
-               "task_id" : <task_id>
-               "cpu_stat" : <>
-               "mem_stat" : <>
-               "io_stat"  : <>
-               "started"  : tstamp
-            }
+            <task_id> + EXCEPTION_KIND + pickle.dumps(<serialized exception object>)
 
-        The `None` message is a die request.
+        A task id of -1 carries an exception from the interchange itself, and puts
+        the executor into a bad state.
         """
         logger.debug("[MTHREAD] queue management worker starting")
 
         while not self.bad_state_is_set:
             try:
-                msgs = self.incoming_q.get(timeout=1)
-
-            except queue.Empty:
-                logger.debug("[MTHREAD] queue empty")
-                # Timed out.
-                pass
+                # An empty batch means the wait timed out, and we fall through to
+                # check whether the executor is shutting down.
+                msgs = self.incoming_q.get_batch(timeout=1)
 
-            except IOError as e:
-                logger.exception("[MTHREAD] Caught broken queue with exception code {}: {}".format(e.errno, e))
+            except (IOError, zmq.ZMQError) as e:
+                logger.exception("[MTHREAD] Caught broken queue: {}".format(e))
                 return
 
             except Exception as e:
                 logger.exception("[MTHREAD] Caught unknown exception: {}".format(e))
-                return
-
-            else:
-
-                if msgs is None:
-                    logger.debug("[MTHREAD] Got None, exiting")
-                    return
-
+                continue
+
+            for serialized_msg in msgs:
+                tid = int.from_bytes(serialized_msg[:8], 'little', signed=True)
+                kind = serialized_msg[8:9]
+
+                if tid == -1:
+                    try:
+                        exception, _ = deserialize_object(pickle.loads(serialized_msg[9:]))
+                    except Exception:
+                        logger.exception("[MTHREAD] Dropping undecodable exception from interchange")
+                        continue
+                    logger.warning("Executor shutting down due to exception from interchange")
+                    self.set_bad_state_and_fail_all(exception)
+                    break
+
+                try:
+                    payload = pickle.loads(serialized_msg[9:])
+                except Exception as e:
+                    logger.exception("[MTHREAD] Bad message for task {}".format(tid))
+                    payload = None
+                    error = BadMessage("Could not decode message for task {}: {}".format(tid, e))
                 else:
-                    for serialized_msg in msgs:
-                        try:
-                            msg = pickle.loads(serialized_msg)
-                            tid = msg['task_id']
-                        except pickle.UnpicklingError:
-                            raise BadMessage("Message received could not be unpickled")
-
-                        except Exception:
-                            raise BadMessage("Message received does not contain 'task_id' field")
-
-                        if tid == -1 and 'exception' in msg:
-                            logger.warning("Executor shutting down due to exception from interchange")
-                            exception, _ = deserialize_object(msg['exception'])
-                            self.set_bad_state_and_fail_all(exception)
-                            break
-
-                        task_fut = self.tasks[tid]
-
-                        if 'result' in msg:
-                            result, _ = deserialize_object(msg['result'])
-                            task_fut.set_result(result)
-
-                        elif 'exception' in msg:
+                    error = None
+
+                try:
+                    # Completed tasks are dropped, so that self.tasks only holds tasks in flight
+                    task_fut = self.tasks.pop(tid)
+                except KeyError:
+                    logger.warning("[MTHREAD] Dropping message for unknown task {}".format(tid))
+                    continue
+
+                if error is not None:
+                    task_fut.set_exception(error)
+
+                elif kind == interchange.RESULT_KIND:
+                    task_fut.set_serialized_result(payload)
+
+                elif kind == interchange.EXCEPTION_KIND:
+                    try:
+                        s, _ = deserialize_object(payload)
+                        # s should be a RemoteExceptionWrapper... so we can reraise it
+                        if isinstance(s, RemoteExceptionWrapper):
                             try:
-                                s, _ = deserialize_object(msg['exception'])
-                                # s should be a RemoteExceptionWrapper... so we can reraise it
-                                if isinstance(s, RemoteExceptionWrapper):
-                                    try:
-                                        s.reraise()
-                                    except Exception as e:
-                                        task_fut.set_exception(e)
-                                elif isinstance(s, Exception):
-                                    task_fut.set_exception(s)
-                                else:
-                                    raise ValueError("Unknown exception-like type received: {}".format(type(s)))
+                                s.reraise()
                             except Exception as e:
-                                # TODO could be a proper wrapped exception?
-                                task_fut.set_exception(
-                                    DeserializationError("Received exception, but handling also threw an exception: {}".format(e)))
+                                task_fut.set_exception(e)
+                        elif isinstance(s, Exception):
+                            task_fut.set_exception(s)
                         else:
-                            raise BadMessage("Message received is neither result or exception")
+                            raise ValueError("Unknown exception-like type received: {}".format(type(s)))
+                    except Exception as e:
+                        # TODO could be a proper wrapped exception?
+                        task_fut.set_exception(
+                            DeserializationError("Received exception, but handling also threw an exception: {}".format(e)))
+                else:
+                    task_fut.set_exception(BadMessage("Message received is neither result or exception"))
 
             if not self.is_alive:
                 break
         logger.info("[MTHREAD] queue management worker finished")
 
+    def _task_flusher(self):
+        """Send tasks queued by submit to the interchange in batches.
+
+        The flusher sleeps until submit signals that tasks are pending. It then waits
+        batch_period milliseconds for more tasks to arrive, and sends everything that
+        is pending in messages of up to batch_size tasks. Each message is a header
+        of packed ``(task_id, buffer count)`` records, followed by the buffers of every
+        task, so that the interchange can route tasks without unpickling anything.
+
+        This is the only thread that uses the outgoing_q socket, so submit is safe
+        to call from any thread.
+        """
+        logger.debug("[FLUSHER] task flusher starting")
+
+        while self.is_alive:
+            if not self._flush_event.wait(timeout=1):
+                continue
+            self._flush_event.clear()
+
+            if self.batch_period:
+                time.sleep(self.batch_period / 1000)
+
+            while self._pending_tasks:
+                header = bytearray()
+                frames = [header]
+                task_count = 0
+                while self._pending_tasks and task_count < self.batch_size:
+                    task_id, fn_buf = self._pending_tasks.popleft()
+                    header += interchange.TASK_HEADER.pack(task_id, len(fn_buf))
+                    frames.extend(fn_buf)
+                    task_count += 1
+
+                try:
+                    self.outgoing_q.put_multipart(frames)
+                except Exception as e:
+                    logger.exception("[FLUSHER] Caught exception while sending tasks: {}".format(e))
+                    self.set_bad_state_and_fail_all(e)
+                    return
+                logger.debug("[FLUSHER] Sent batch of %s tasks", task_count)
+
+        logger.info("[FLUSHER] task flusher finished")
+
     # When the executor gets lost, the weakref callback will wake up
     # the queue management thread.
     def weakref_cb(self, q=None):
         """We do not use this yet."""
         q.put(None)
 
-    def _start_local_queue_process(self):
+    def _create_client_pipes(self, client_urls):
+        """ Creates the task, result and command channels to the interchange
+
+        Each channel binds to its url in client_urls, or to a random port in
+        interchange_port_range where the url is None.
+        """
+        # The task and result pipes share one context, and so one set of ZMQ I/O threads
+        self._zmq_context = zmq.Context(io_threads=self.zmq_io_threads)
+        self.outgoing_q = zmq_pipes.TasksOutgoing("127.0.0.1", self.interchange_port_range,
+                                                  context=self._zmq_context,
+                                                  hwm=self.zmq_hwm,
+                                                  url=client_urls[0])
+        self.incoming_q = zmq_pipes.ResultsIncoming("127.0.0.1", self.interchange_port_range,
+                                                    context=self._zmq_context,
+                                                    hwm=self.zmq_hwm,
+                                                    url=client_urls[1])
+        self.command_client = zmq_pipes.CommandClient("127.0.0.1", self.interchange_port_range,
+                                                      url=client_urls[2])
+
+    def _start_local_queue_process(self, client_urls):
         """ Starts the interchange process locally
 
-        Starts the interchange process locally and uses an internal command queue to
-        get the worker task and result ports that the interchange has bound to.
+        Starts the interchange process locally and uses a one-way pipe to get the
+        worker task and result ports that the interchange has bound to. The
+        interchange connects to client_urls, which need not be bound yet.
         """
-        comm_q = Queue(maxsize=10)
+        comm_recv, comm_send = Pipe(duplex=False)
         self.queue_proc = Process(target=interchange.starter,
-                                  args=(comm_q,),
-                                  kwargs={"client_ports": (self.outgoing_q.port,
-                                                           self.incoming_q.port,
-                                                           self.command_client.port),
+                                  args=(comm_send,),
+                                  kwargs={"client_urls": client_urls,
                                           "worker_ports": self.worker_ports,
                                           "worker_port_range": self.worker_port_range,
                                           "hub_address": self.hub_address,
@@ -430,11 +613,17 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
                                   name="HTEX-Interchange"
         )
         self.queue_proc.start()
+        comm_send.close()
         try:
-            (self.worker_task_port, self.worker_result_port) = comm_q.get(block=True, timeout=120)
-        except queue.Empty:
-            logger.error("Interchange has not completed initialization in 120s. Aborting")
+            if not comm_recv.poll(120):
+                logger.error("Interchange has not completed initialization in 120s. Aborting")
+                raise Exception("Interchange failed to start")
+            (self.worker_task_port, self.worker_result_port) = comm_recv.recv()
+        except EOFError:
+            logger.error("Interchange exited before completing initialization. Aborting")
             raise Exception("Interchange failed to start")
+        finally:
+            comm_recv.close()
 
     def _start_queue_management_thread(self):
         """Method to start the management thread as a daemon.
@@ -452,6 +641,18 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
         else:
             logger.debug("Management thread already exists, returning")
 
+    def _start_task_flusher_thread(self):
+        """Method to start the task flusher thread as a daemon."""
+        if self._task_flusher_thread is None:
+            logger.debug("Starting task flusher thread")
+            self._task_flusher_thread = threading.Thread(target=self._task_flusher, name="HTEX-Task-Flusher")
+            self._task_flusher_thread.daemon = True
+            self._task_flusher_thread.start()
+            logger.debug("Started task flusher thread")
+
+        else:
+            logger.debug("Task flusher thread already exists, returning")
+
     def hold_worker(self, worker_id):
         """Puts a worker on hold, preventing scheduling of additional tasks to it.
 
@@ -519,29 +720,57 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
         if self.bad_state_is_set:
             raise self.executor_exception
 
-        self._task_counter += 1
-        task_id = self._task_counter
+        task_id = next(self._task_counter)
+
+        # Only build the message when it will be logged, as repr can be expensive
+        # for large arguments
+        if logger.isEnabledFor(logging.DEBUG):
+            # handle people sending blobs gracefully
+            args_to_print = []
+            for arg in args:
+                arg_repr = repr(arg)
+                args_to_print.append(arg if len(arg_repr) < 100 else (arg_repr[:100] + '...'))
+            logger.debug("Pushing function %s to queue with args %s", func, tuple(args_to_print))
+
+        fut = LazyResultFuture()
+        self.tasks[task_id] = fut
+
+        fn_buf = pack_task(self._pack_function(func), args, kwargs,
+                           buffer_threshold=BUFFER_THRESHOLD,
+                           item_threshold=ITEM_THRESHOLD)
+        # Large arguments such as memoryviews or numpy arrays are left in fn_buf as
+        # views onto the caller's memory. The task is only sent later by the flusher
+        # thread, so they are copied now, before the caller can modify them.
+        fn_buf = [buf if isinstance(buf, bytes) else bytes(buf) for buf in fn_buf]
+
+        # Hand the task to the flusher thread, which batches it with any other
+        # pending tasks into a single message to the interchange.
+        self._pending_tasks.append((task_id, fn_buf))
+        self._flush_event.set()
 
-        # handle people sending blobs gracefully
-        args_to_print = args
-        if logger.getEffectiveLevel() >= logging.DEBUG:
-            args_to_print = tuple([arg if len(repr(arg)) < 100 else (repr(arg)[:100] + '...') for arg in args])
-        logger.debug("Pushing function {} to queue with args {}".format(func, args_to_print))
-
-        self.tasks[task_id] = Future()
+        # Return the future
+        return fut
 
-        fn_buf = pack_apply_message(func, args, kwargs,
-                                    buffer_threshold=1024 * 1024,
-                                    item_threshold=1024)
+    def _pack_function(self, func):
+        """Returns func serialized by pack_function, so that apps submitted many
+        times only pay for pickling their function on the first submission.
 
-        msg = {"task_id": task_id,
-               "buffer": fn_buf}
+        Only functions whose serialized form cannot go stale are cached, see
+        _function_snapshot. Closures over other values, functions with default
+        arguments, partials and callable objects are packed on every submission.
+        The cache holds weak references, so entries go away with the function.
+        """
+        snapshot = _function_snapshot(func)
+        if snapshot is None:
+            return pack_function(func)
 
-        # Post task to the the outgoing queue
-        self.outgoing_q.put(msg)
+        cached = self._function_cache.get(func)
+        if cached is not None and cached[0] == snapshot:
+            return cached[1]
 
-        # Return the future
-        return self.tasks[task_id]
+        f_buf = pack_function(func)
+        self._function_cache[func] = (snapshot, f_buf)
+        return f_buf
 
     @property
     def scaling_enabled(self):
@@ -620,6 +849,25 @@ class HighThroughputExecutor(StatusHandlingExecutor, RepresentationMixin):
         """
 
         logger.info("Attempting HighThroughputExecutor shutdown")
+        # Lets the queue management and task flusher threads exit at their next timeout
+        self.is_alive = False
+        self._flush_event.set()
+
+        # The pipes can only be closed once the threads using them are gone. Closing
+        # them also removes their ipc:// socket files from the temp directory. All
+        # sockets are set to not linger, so terminating the context cannot block.
+        threads = (self._task_flusher_thread, self._queue_management_thread)
+        for thread in threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=5)
+        if any(thread.is_alive() for thread in threads):
+            logger.warning("Leaving interchange pipes open, as threads using them are still running")
+        else:
+            self.outgoing_q.close()
+            self.incoming_q.close()
+            self._zmq_context.term()
+        self.command_client.close()
+
         self.queue_proc.terminate()
         logger.info("Finished HighThroughputExecutor shutdown attempt")
         return True
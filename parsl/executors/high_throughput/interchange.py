@@ -12,6 +12,8 @@ import logging
 import queue
 import threading
 import json
+import struct
+from collections import OrderedDict
 
 from parsl.version import VERSION as PARSL_VERSION
 from ipyparallel.serialize import serialize_object
@@ -24,6 +26,19 @@ LOOP_SLOWDOWN = 0.0  # in seconds
 HEARTBEAT_CODE = (2 ** 32) - 1
 PKL_HEARTBEAT_CODE = pickle.dumps((2 ** 32) - 1)
 
+# Batches of tasks from the executor start with a header frame holding one
+# (task_id, buffer count) record per task, so it can be read without unpickling.
+TASK_HEADER = struct.Struct('<qI')
+
+# Total size of the serialized functions remembered for deduplication. The least
+# recently used are forgotten first.
+MAX_FUNCTION_BUFFER_BYTES = 16 * 1024 * 1024
+
+# Result messages are the task id as 8 bytes, one of these kind bytes, and the
+# pickled buffers of the serialized result or exception.
+RESULT_KIND = b'r'
+EXCEPTION_KIND = b'e'
+
 
 class ShutdownRequest(Exception):
     ''' Exception raised when any async component receives a ShutdownRequest
@@ -88,6 +103,7 @@ class Interchange(object):
                  interchange_address="127.0.0.1",
                  hub_address=None,
                  client_ports=(50055, 50056, 50057),
+                 client_urls=None,
                  worker_ports=None,
                  worker_port_range=(54000, 55000),
                  hub_port=None,
@@ -113,6 +129,10 @@ class Interchange(object):
         client_ports : triple(int, int, int)
              The ports at which the client can be reached
 
+        client_urls : triple(str, str, str)
+             ZMQ urls at which the client's task, result and command channels can be reached.
+             When set, this overrides client_address and client_ports. Default: None
+
         worker_ports : tuple(int, int)
              The specific two ports at which workers will connect to the Interchange. Default: None
 
@@ -151,20 +171,21 @@ class Interchange(object):
         self.suppress_failure = suppress_failure
         self.poll_period = poll_period
 
-        logger.info("Attempting connection to client at {} on ports: {},{},{}".format(
-            client_address, client_ports[0], client_ports[1], client_ports[2]))
+        if client_urls is None:
+            client_urls = ["tcp://{}:{}".format(client_address, port) for port in client_ports]
+        logger.info("Attempting connection to client at: {},{},{}".format(*client_urls))
         self.context = zmq.Context()
-        self.task_incoming = self.context.socket(zmq.DEALER)
+        self.task_incoming = self.context.socket(zmq.PULL)
         self.task_incoming.set_hwm(0)
         self.task_incoming.RCVTIMEO = 10  # in milliseconds
-        self.task_incoming.connect("tcp://{}:{}".format(client_address, client_ports[0]))
-        self.results_outgoing = self.context.socket(zmq.DEALER)
+        self.task_incoming.connect(client_urls[0])
+        self.results_outgoing = self.context.socket(zmq.PUSH)
         self.results_outgoing.set_hwm(0)
-        self.results_outgoing.connect("tcp://{}:{}".format(client_address, client_ports[1]))
+        self.results_outgoing.connect(client_urls[1])
 
         self.command_channel = self.context.socket(zmq.REP)
         self.command_channel.RCVTIMEO = 1000  # in milliseconds
-        self.command_channel.connect("tcp://{}:{}".format(client_address, client_ports[2]))
+        self.command_channel.connect(client_urls[2])
         logger.info("Connected to client")
 
         self.monitoring_enabled = False
@@ -228,7 +249,7 @@ class Interchange(object):
         Returns
         -------
         List of upto count tasks. May return fewer than count down to an empty list
-            eg. [{'task_id':<x>, 'buffer':<buf>} ... ]
+            eg. [(<task_id>, <buffers>) ... ]
         """
         tasks = []
         for i in range(0, count):
@@ -255,21 +276,49 @@ class Interchange(object):
         poller = zmq.Poller()
         poller.register(self.task_incoming, zmq.POLLIN)
 
+        # Tasks for the same app carry identical serialized functions. Sharing one
+        # bytes object between them lets pickle send the function only once in
+        # each batch of tasks sent to a manager.
+        function_buffers = OrderedDict()
+        function_buffer_bytes = 0
+
         while not kill_event.is_set():
             try:
-                msg = self.task_incoming.recv_pyobj()
+                header, *buffers = self.task_incoming.recv_multipart()
             except zmq.Again:
                 # We just timed out while attempting to receive
-                logger.debug("[TASK_PULL_THREAD] {} tasks in internal queue".format(self.pending_task_queue.qsize()))
+                logger.debug("[TASK_PULL_THREAD] %s tasks in internal queue", self.pending_task_queue.qsize())
                 continue
 
-            if msg == 'STOP':
+            if header == b'STOP':
                 kill_event.set()
                 break
             else:
-                self.pending_task_queue.put(msg)
-                task_counter += 1
-                logger.debug("[TASK_PULL_THREAD] Fetched task:{}".format(task_counter))
+                # Tasks arrive in batches: a header of TASK_HEADER records, followed
+                # by the buffers of every task in order. The buffers are passed on
+                # to the managers untouched.
+                offset = 0
+                batch_count = 0
+                for task_id, buffer_count in TASK_HEADER.iter_unpack(header):
+                    task_buffers = buffers[offset:offset + buffer_count]
+                    f_buf = function_buffers.get(task_buffers[0])
+                    if f_buf is not None:
+                        function_buffers.move_to_end(f_buf)
+                        task_buffers[0] = f_buf
+                    else:
+                        f_buf = task_buffers[0]
+                        function_buffers[f_buf] = f_buf
+                        function_buffer_bytes += len(f_buf)
+                        while function_buffer_bytes > MAX_FUNCTION_BUFFER_BYTES:
+                            _, evicted = function_buffers.popitem(last=False)
+                            function_buffer_bytes -= len(evicted)
+                    # Tasks are plain (task_id, buffers) tuples, which are cheaper to
+                    # build, pickle and unpickle than dicts
+                    self.pending_task_queue.put((task_id, task_buffers))
+                    offset += buffer_count
+                    batch_count += 1
+                task_counter += batch_count
+                logger.debug("[TASK_PULL_THREAD] Fetched %s tasks, total:%s", batch_count, task_counter)
 
     def _command_server(self, kill_event):
         """ Command server to run async command to the interchange
@@ -278,7 +327,7 @@ class Interchange(object):
         while not kill_event.is_set():
             try:
                 command_req = self.command_channel.recv_pyobj()
-                logger.debug("[COMMAND] Received command request: {}".format(command_req))
+                logger.debug("[COMMAND] Received command request: %s", command_req)
                 if command_req == "OUTSTANDING_C":
                     outstanding = self.pending_task_queue.qsize()
                     for manager in self._ready_manager_queue:
@@ -318,7 +367,7 @@ class Interchange(object):
                 else:
                     reply = None
 
-                logger.debug("[COMMAND] Reply: {}".format(reply))
+                logger.debug("[COMMAND] Reply: %s", reply)
                 self.command_channel.send_pyobj(reply)
 
             except zmq.Again:
@@ -382,7 +431,7 @@ class Interchange(object):
                     except Exception:
                         logger.warning("[MAIN] Got Exception reading registration message from manager: {}".format(
                             manager), exc_info=True)
-                        logger.debug("[MAIN] Message :\n{}\n".format(message[0]))
+                        logger.debug("[MAIN] Message :\n%s\n", message[0])
 
                     # By default we set up to ignore bad nodes/registration messages.
                     self._ready_manager_queue[manager] = {'last': time.time(),
@@ -409,8 +458,7 @@ class Interchange(object):
                                 logger.debug("Setting kill event")
                                 self._kill_event.set()
                                 e = ManagerLost(manager, self._ready_manager_queue[manager]['hostname'])
-                                result_package = {'task_id': -1, 'exception': serialize_object(e)}
-                                pkl_package = pickle.dumps(result_package)
+                                pkl_package = (-1).to_bytes(8, 'little', signed=True) + EXCEPTION_KIND + pickle.dumps(serialize_object(e))
                                 self.results_outgoing.send(pkl_package)
                                 logger.warning("[MAIN] Sent failure reports, unregistering manager")
                             else:
@@ -424,29 +472,27 @@ class Interchange(object):
                         if self.suppress_failure is False:
                             self._kill_event.set()
                             e = BadRegistration(manager, critical=True)
-                            result_package = {'task_id': -1, 'exception': serialize_object(e)}
-                            pkl_package = pickle.dumps(result_package)
+                            pkl_package = (-1).to_bytes(8, 'little', signed=True) + EXCEPTION_KIND + pickle.dumps(serialize_object(e))
                             self.results_outgoing.send(pkl_package)
                         else:
-                            logger.debug("[MAIN] Suppressing bad registration from manager:{}".format(
-                                manager))
+                            logger.debug("[MAIN] Suppressing bad registration from manager:%s", manager)
 
                 else:
                     tasks_requested = int.from_bytes(message[1], "little")
                     self._ready_manager_queue[manager]['last'] = time.time()
                     if tasks_requested == HEARTBEAT_CODE:
-                        logger.debug("[MAIN] Manager {} sent heartbeat".format(manager))
+                        logger.debug("[MAIN] Manager %s sent heartbeat", manager)
                         self.task_outgoing.send_multipart([manager, b'', PKL_HEARTBEAT_CODE])
                     else:
-                        logger.debug("[MAIN] Manager {} requested {} tasks".format(manager, tasks_requested))
+                        logger.debug("[MAIN] Manager %s requested %s tasks", manager, tasks_requested)
                         self._ready_manager_queue[manager]['free_capacity'] = tasks_requested
                         interesting_managers.add(manager)
                 logger.debug("[MAIN] leaving task_outgoing section")
 
             # If we had received any requests, check if there are tasks that could be passed
 
-            logger.debug("Managers count (total/interesting): {}/{}".format(len(self._ready_manager_queue),
-                                                                            len(interesting_managers)))
+            logger.debug("Managers count (total/interesting): %s/%s", len(self._ready_manager_queue),
+                         len(interesting_managers))
 
             if interesting_managers and not self.pending_task_queue.empty():
                 shuffled_managers = list(interesting_managers)
@@ -464,20 +510,20 @@ class Interchange(object):
                             self.task_outgoing.send_multipart([manager, b'', pickle.dumps(tasks)])
                             task_count = len(tasks)
                             count += task_count
-                            tids = [t['task_id'] for t in tasks]
+                            tids = [tid for tid, _ in tasks]
                             self._ready_manager_queue[manager]['free_capacity'] -= task_count
                             self._ready_manager_queue[manager]['tasks'].extend(tids)
-                            logger.debug("[MAIN] Sent tasks: {} to manager {}".format(tids, manager))
+                            logger.debug("[MAIN] Sent tasks: %s to manager %s", tids, manager)
                             if self._ready_manager_queue[manager]['free_capacity'] > 0:
-                                logger.debug("[MAIN] Manager {} has free_capacity {}".format(manager, self._ready_manager_queue[manager]['free_capacity']))
+                                logger.debug("[MAIN] Manager %s has free_capacity %s", manager, self._ready_manager_queue[manager]['free_capacity'])
                                 # ... so keep it in the interesting_managers list
                             else:
-                                logger.debug("[MAIN] Manager {} is now saturated".format(manager))
+                                logger.debug("[MAIN] Manager %s is now saturated", manager)
                                 interesting_managers.remove(manager)
                     else:
                         interesting_managers.remove(manager)
                         # logger.debug("Nothing to send to manager {}".format(manager))
-                logger.debug("[MAIN] leaving _ready_manager_queue section, with {} managers still interesting".format(len(interesting_managers)))
+                logger.debug("[MAIN] leaving _ready_manager_queue section, with %s managers still interesting", len(interesting_managers))
             else:
                 logger.debug("[MAIN] either no interesting managers or no tasks, so skipping manager pass")
             # Receive any results and forward to client
@@ -487,27 +533,27 @@ class Interchange(object):
                 if manager not in self._ready_manager_queue:
                     logger.warning("[MAIN] Received a result from a un-registered manager: {}".format(manager))
                 else:
-                    logger.debug("[MAIN] Got {} result items in batch".format(len(b_messages)))
+                    logger.debug("[MAIN] Got %s result items in batch", len(b_messages))
                     for b_message in b_messages:
-                        r = pickle.loads(b_message)
-                        # logger.debug("[MAIN] Received result for task {} from {}".format(r['task_id'], manager))
-                        self._ready_manager_queue[manager]['tasks'].remove(r['task_id'])
+                        # Each result is prefixed with its task id, so there is no need to unpickle it here
+                        tid = int.from_bytes(b_message[:8], 'little', signed=True)
+                        self._ready_manager_queue[manager]['tasks'].remove(tid)
                     self.results_outgoing.send_multipart(b_messages)
-                    logger.debug("[MAIN] Current tasks: {}".format(self._ready_manager_queue[manager]['tasks']))
+                    logger.debug("[MAIN] Current tasks: %s", self._ready_manager_queue[manager]['tasks'])
                 logger.debug("[MAIN] leaving results_incoming section")
 
             bad_managers = [manager for manager in self._ready_manager_queue if
                             time.time() - self._ready_manager_queue[manager]['last'] > self.heartbeat_threshold]
             for manager in bad_managers:
-                logger.debug("[MAIN] Last: {} Current: {}".format(self._ready_manager_queue[manager]['last'], time.time()))
+                logger.debug("[MAIN] Last: %s Current: %s", self._ready_manager_queue[manager]['last'], time.time())
                 logger.warning("[MAIN] Too many heartbeats missed for manager {}".format(manager))
 
                 for tid in self._ready_manager_queue[manager]['tasks']:
                     try:
                         raise ManagerLost(manager, self._ready_manager_queue[manager]['hostname'])
                     except Exception:
-                        result_package = {'task_id': tid, 'exception': serialize_object(RemoteExceptionWrapper(*sys.exc_info()))}
-                        pkl_package = pickle.dumps(result_package)
+                        result_package = serialize_object(RemoteExceptionWrapper(*sys.exc_info()))
+                        pkl_package = tid.to_bytes(8, 'little', signed=True) + EXCEPTION_KIND + pickle.dumps(result_package)
                         self.results_outgoing.send(pkl_package)
                         logger.warning("[MAIN] Sent failure reports, unregistering manager")
                 self._ready_manager_queue.pop(manager, 'None')
@@ -552,15 +598,17 @@ def start_file_logger(filename, name='interchange', level=logging.DEBUG, format_
     logger.addHandler(handler)
 
 
-def starter(comm_q, *args, **kwargs):
+def starter(comm_conn, *args, **kwargs):
     """Start the interchange process
 
     The executor is expected to call this function. The args, kwargs match that of the Interchange.__init__
+    comm_conn is the sending end of a multiprocessing Pipe, on which the worker ports are reported.
     """
     # logger = multiprocessing.get_logger()
     ic = Interchange(*args, **kwargs)
-    comm_q.put((ic.worker_task_port,
-                ic.worker_result_port))
+    comm_conn.send((ic.worker_task_port,
+                    ic.worker_result_port))
+    comm_conn.close()
     ic.start()
 
 
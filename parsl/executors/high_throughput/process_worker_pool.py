@@ -22,12 +22,12 @@ from parsl.version import VERSION as PARSL_VERSION
 from parsl.app.errors import RemoteExceptionWrapper
 from parsl.executors.high_throughput.errors import WorkerLost
 from parsl.executors.high_throughput.probe import probe_addresses
+from parsl.executors.serialize import unpack_task
 if platform.system() == 'Darwin':
     from parsl.executors.high_throughput.mac_safe_queue import MacSafeQueue as mpQueue
 else:
     from multiprocessing import Queue as mpQueue
 
-from ipyparallel.serialize import unpack_apply_message  # pack_apply_message,
 from ipyparallel.serialize import serialize_object
 
 RESULT_TAG = 10
@@ -35,6 +35,10 @@ TASK_REQUEST_TAG = 11
 
 HEARTBEAT_CODE = (2 ** 32) - 1
 
+# Kind bytes which follow the task id in result messages
+RESULT_KIND = b'r'
+EXCEPTION_KIND = b'e'
+
 
 class Manager(object):
     """ Manager manages task execution by the workers
@@ -265,13 +269,14 @@ class Manager(object):
 
                 else:
                     task_recv_counter += len(tasks)
-                    logger.debug("[TASK_PULL_THREAD] Got tasks: {} of {}".format([t['task_id'] for t in tasks],
-                                                                                 task_recv_counter))
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("[TASK_PULL_THREAD] Got tasks: %s of %s", [tid for tid, _ in tasks],
+                                     task_recv_counter)
 
                     for task in tasks:
                         self.pending_task_queue.put(task)
                         # logger.debug("[TASK_PULL_THREAD] Ready tasks: {}".format(
-                        #    [i['task_id'] for i in self.pending_task_queue]))
+                        #    [tid for tid, _ in self.pending_task_queue]))
 
             else:
                 logger.debug("[TASK_PULL_THREAD] No incoming tasks")
@@ -340,14 +345,14 @@ class Manager(object):
                 if not p.is_alive():
                     logger.info("[WORKER_WATCHDOG_THREAD] Worker {} has died".format(worker_id))
                     try:
-                        task = self._tasks_in_progress.pop(worker_id)
+                        tid, _ = self._tasks_in_progress.pop(worker_id)
                         logger.info("[WORKER_WATCHDOG_THREAD] Worker {} was busy when it died".format(worker_id))
                         try:
                             raise WorkerLost(worker_id, platform.node())
                         except Exception:
-                            logger.info("[WORKER_WATCHDOG_THREAD] Putting exception for task {} in the pending result queue".format(task['task_id']))
-                            result_package = {'task_id': task['task_id'], 'exception': serialize_object(RemoteExceptionWrapper(*sys.exc_info()))}
-                            pkl_package = pickle.dumps(result_package)
+                            logger.info("[WORKER_WATCHDOG_THREAD] Putting exception for task {} in the pending result queue".format(tid))
+                            result_package = serialize_object(RemoteExceptionWrapper(*sys.exc_info()))
+                            pkl_package = tid.to_bytes(8, 'little', signed=True) + EXCEPTION_KIND + pickle.dumps(result_package)
                             self.pending_result_queue.put(pkl_package)
                     except KeyError:
                         logger.info("[WORKER_WATCHDOG_THREAD] Worker {} was not busy when it died".format(worker_id))
@@ -436,7 +441,7 @@ def execute_task(bufs):
     user_ns = locals()
     user_ns.update({'__builtins__': __builtins__})
 
-    f, args, kwargs = unpack_apply_message(bufs, user_ns, copy=False)
+    f, args, kwargs = unpack_task(bufs, user_ns)
 
     # We might need to look into callability of the function from itself
     # since we change it's name in the new namespace
@@ -492,10 +497,10 @@ def worker(worker_id, pool_id, pool_size, task_queue, result_queue, worker_queue
     while True:
         worker_queue.put(worker_id)
 
-        # The worker will receive {'task_id':<tid>, 'buffer':<buf>}
+        # The worker will receive (<task_id>, <buffers>)
         req = task_queue.get()
         tasks_in_progress[worker_id] = req
-        tid = req['task_id']
+        tid, bufs = req
         logger.info("Received task {}".format(tid))
 
         try:
@@ -505,17 +510,20 @@ def worker(worker_id, pool_id, pool_size, task_queue, result_queue, worker_queue
             pass
 
         try:
-            result = execute_task(req['buffer'])
+            result = execute_task(bufs)
             serialized_result = serialize_object(result)
         except Exception as e:
             logger.info('Caught an exception: {}'.format(e))
-            result_package = {'task_id': tid, 'exception': serialize_object(RemoteExceptionWrapper(*sys.exc_info()))}
+            kind = EXCEPTION_KIND
+            result_package = serialize_object(RemoteExceptionWrapper(*sys.exc_info()))
         else:
-            result_package = {'task_id': tid, 'result': serialized_result}
+            kind = RESULT_KIND
+            result_package = serialized_result
             # logger.debug("Result: {}".format(result))
 
         logger.info("Completed task {}".format(tid))
-        pkl_package = pickle.dumps(result_package)
+        # The task id prefix lets the interchange route the result without unpickling it
+        pkl_package = tid.to_bytes(8, 'little', signed=True) + kind + pickle.dumps(result_package)
 
         result_queue.put(pkl_package)
         tasks_in_progress.pop(worker_id)
@@ -1,18 +1,66 @@
 #!/usr/bin/env python3
 
+import os
 import zmq
-import time
-import pickle
+import uuid
 import logging
+import tempfile
 import threading
 
 logger = logging.getLogger(__name__)
 
 
+# Frames smaller than this are copied by ZMQ rather than sent zero-copy
+ZERO_COPY_THRESHOLD = 64 * 1024
+
+# Longest path a Unix domain socket can bind to. sun_path holds 108 bytes on
+# Linux and 104 on macOS, including the terminating NUL.
+MAX_IPC_PATH_LENGTH = 103
+
+
+def ipc_url():
+    """ Returns a fresh ipc:// url in the temp directory, or None if the path would
+    be too long for a Unix domain socket.
+
+    The url is known before anything binds to it, so a peer can be told where to
+    connect before the socket it connects to exists.
+    """
+    path = os.path.join(tempfile.gettempdir(), "parsl-htex-{}.ipc".format(uuid.uuid4().hex))
+    if len(os.fsencode(path)) > MAX_IPC_PATH_LENGTH:
+        logger.debug("Not using ipc, as socket path %s is too long", path)
+        return None
+    return "ipc://{}".format(path)
+
+
+def _bind(zmq_socket, ip_address, port_range, url):
+    """ Binds zmq_socket to url, or to a random TCP port in port_range if url is None.
+
+    Returns the url peers should connect to, and the TCP port (None if url was given).
+    """
+    if url is not None:
+        zmq_socket.bind(url)
+        return url, None
+
+    port = zmq_socket.bind_to_random_port("tcp://{}".format(ip_address),
+                                          min_port=port_range[0],
+                                          max_port=port_range[1])
+    return "tcp://{}:{}".format(ip_address, port), port
+
+
+def _remove_ipc_file(url):
+    """ Removes the socket file behind an ipc:// url, which libzmq leaves behind on close.
+    """
+    if url.startswith("ipc://"):
+        try:
+            os.unlink(url[len("ipc://"):])
+        except FileNotFoundError:
+            pass
+
+
 class CommandClient(object):
     """ CommandClient
     """
-    def __init__(self, ip_address, port_range):
+    def __init__(self, ip_address, port_range, url=None):
         """
         Parameters
         ----------
@@ -21,12 +69,16 @@ class CommandClient(object):
            IP address of the client (where Parsl runs)
         port_range: tuple(int, int)
            Port range for the comms between client and interchange
+        url: str
+           Endpoint to bind to, such as one from ipc_url, instead of a random TCP
+           port in port_range.
 
         """
         self.context = zmq.Context()
         self.ip_address = ip_address
         self.port_range = port_range
         self.port = None
+        self.url = url
         self.create_socket_and_bind()
         self._lock = threading.Lock()
 
@@ -37,12 +89,10 @@ class CommandClient(object):
         """
         self.zmq_socket = self.context.socket(zmq.REQ)
         self.zmq_socket.setsockopt(zmq.LINGER, 0)
-        if self.port is None:
-            self.port = self.zmq_socket.bind_to_random_port("tcp://{}".format(self.ip_address),
-                                                            min_port=self.port_range[0],
-                                                            max_port=self.port_range[1])
+        if self.url is None:
+            self.url, self.port = _bind(self.zmq_socket, self.ip_address, self.port_range, None)
         else:
-            self.zmq_socket.bind("tcp://{}:{}".format(self.ip_address, self.port))
+            self.zmq_socket.bind(self.url)
 
     def run(self, message, max_retries=3):
         """ This function needs to be fast at the same time aware of the possibility of
@@ -75,13 +125,14 @@ class CommandClient(object):
 
     def close(self):
         self.zmq_socket.close()
+        _remove_ipc_file(self.url)
         self.context.term()
 
 
 class TasksOutgoing(object):
     """ Outgoing task queue from the executor to the Interchange
     """
-    def __init__(self, ip_address, port_range):
+    def __init__(self, ip_address, port_range, context=None, hwm=0, url=None):
         """
         Parameters
         ----------
@@ -90,47 +141,64 @@ class TasksOutgoing(object):
            IP address of the client (where Parsl runs)
         port_range: tuple(int, int)
            Port range for the comms between client and interchange
+        context: zmq.Context
+           Context to create the socket in. If None, a private context is created
+           and terminated on close.
+        hwm: int
+           High water mark of the socket, in messages. 0 means unbounded.
+        url: str
+           Endpoint to bind to, such as one from ipc_url, instead of a random TCP
+           port in port_range. ipc:// urls are only usable when the interchange
+           runs on the same host.
 
         """
-        self.context = zmq.Context()
-        self.zmq_socket = self.context.socket(zmq.DEALER)
-        self.zmq_socket.set_hwm(0)
-        self.port = self.zmq_socket.bind_to_random_port("tcp://{}".format(ip_address),
-                                                        min_port=port_range[0],
-                                                        max_port=port_range[1])
+        self._owns_context = context is None
+        self.context = zmq.Context() if context is None else context
+        self.zmq_socket = self.context.socket(zmq.PUSH)
+        self.zmq_socket.set_hwm(hwm)
+        self.zmq_socket.setsockopt(zmq.LINGER, 0)
+        self.zmq_socket.setsockopt(zmq.TCP_KEEPALIVE, 1)
+        self.url, self.port = _bind(self.zmq_socket, ip_address, port_range, url)
         self.poller = zmq.Poller()
         self.poller.register(self.zmq_socket, zmq.POLLOUT)
 
-    def put(self, message):
-        """ This function needs to be fast at the same time aware of the possibility of
-        ZMQ pipes overflowing.
+    def put_multipart(self, frames):
+        """ Sends a list of buffers as one multipart message.
 
-        The timeout increases slowly if contention is detected on ZMQ pipes.
-        We could set copy=False and get slightly better latency but this results
-        in ZMQ sockets reaching a broken state once there are ~10k tasks in flight.
-        This issue can be magnified if each the serialized buffer itself is larger.
+        Each buffer is sent as a frame of its own so that large buffers are never
+        copied into a pickle. This blocks while the ZMQ pipe is full.
         """
+        last = len(frames) - 1
+
         timeout_ms = 0
         while True:
             socks = dict(self.poller.poll(timeout=timeout_ms))
             if self.zmq_socket in socks and socks[self.zmq_socket] == zmq.POLLOUT:
-                # The copy option adds latency but reduces the risk of ZMQ overflow
-                self.zmq_socket.send_pyobj(message, copy=True)
+                for i, frame in enumerate(frames):
+                    # bytes are immutable, so ZMQ can take large ones without a copy.
+                    # Small frames are cheaper to copy than to track until sent. Other
+                    # buffers could be modified after this returns and must be copied.
+                    copy = not isinstance(frame, bytes) or len(frame) < ZERO_COPY_THRESHOLD
+                    self.zmq_socket.send(frame,
+                                         flags=zmq.SNDMORE if i < last else 0,
+                                         copy=copy)
                 return
             else:
                 timeout_ms += 1
-                logger.debug("Not sending due to full zmq pipe, timeout: {} ms".format(timeout_ms))
+                logger.debug("Not sending due to full zmq pipe, timeout: %s ms", timeout_ms)
 
     def close(self):
         self.zmq_socket.close()
-        self.context.term()
+        _remove_ipc_file(self.url)
+        if self._owns_context:
+            self.context.term()
 
 
 class ResultsIncoming(object):
     """ Incoming results queue from the Interchange to the executor
     """
 
-    def __init__(self, ip_address, port_range):
+    def __init__(self, ip_address, port_range, context=None, hwm=0, url=None):
         """
         Parameters
         ----------
@@ -139,23 +207,48 @@ class ResultsIncoming(object):
            IP address of the client (where Parsl runs)
         port_range: tuple(int, int)
            Port range for the comms between client and interchange
+        context: zmq.Context
+           Context to create the socket in. If None, a private context is created
+           and terminated on close.
+        hwm: int
+           High water mark of the socket, in messages. 0 means unbounded.
+        url: str
+           Endpoint to bind to, such as one from ipc_url, instead of a random TCP
+           port in port_range. ipc:// urls are only usable when the interchange
+           runs on the same host.
 
         """
-        self.context = zmq.Context()
-        self.results_receiver = self.context.socket(zmq.DEALER)
-        self.results_receiver.set_hwm(0)
-        self.port = self.results_receiver.bind_to_random_port("tcp://{}".format(ip_address),
-                                                              min_port=port_range[0],
-                                                              max_port=port_range[1])
-
-    def get(self, block=True, timeout=None):
-        return self.results_receiver.recv_multipart()
-
-    def request_close(self):
-        status = self.results_receiver.send(pickle.dumps(None))
-        time.sleep(0.1)
-        return status
+        self._owns_context = context is None
+        self.context = zmq.Context() if context is None else context
+        self.results_receiver = self.context.socket(zmq.PULL)
+        self.results_receiver.set_hwm(hwm)
+        self.results_receiver.setsockopt(zmq.LINGER, 0)
+        self.results_receiver.setsockopt(zmq.TCP_KEEPALIVE, 1)
+        self.url, self.port = _bind(self.results_receiver, ip_address, port_range, url)
+
+    def get_batch(self, timeout=None, max_messages=64):
+        """ Returns the frames of up to max_messages result messages as a single list.
+
+        Frames are received without copying, and are returned as memoryviews
+        which can be sliced and passed to ``pickle.loads`` without further copies.
+
+        Waits up to timeout seconds for the first message, then takes any further
+        messages which have already arrived without blocking. A timeout returns an
+        empty list rather than raising, so that idle callers do not pay for an
+        exception on every wakeup.
+        """
+        if timeout is not None and not self.results_receiver.poll(timeout * 1000):
+            return []
+        frames = [frame.buffer for frame in self.results_receiver.recv_multipart(copy=False)]
+        try:
+            for _ in range(max_messages - 1):
+                frames.extend(frame.buffer for frame in self.results_receiver.recv_multipart(zmq.NOBLOCK, copy=False))
+        except zmq.Again:
+            pass
+        return frames
 
     def close(self):
         self.results_receiver.close()
-        self.context.term()
+        _remove_ipc_file(self.url)
+        if self._owns_context:
+            self.context.term()
@@ -5,6 +5,7 @@ from .canning import (
 from .serialize import (
     serialize_object, deserialize_object,
     pack_apply_message, unpack_apply_message,
+    pack_function, pack_task, unpack_task,
 )
 
 __all__ = (
@@ -20,4 +21,7 @@ __all__ = (
     'deserialize_object',
     'pack_apply_message',
     'unpack_apply_message',
+    'pack_function',
+    'pack_task',
+    'unpack_task',
 )
@@ -27,6 +27,10 @@ from .canning import (
 MAX_ITEMS = 64
 MAX_BYTES = 1024
 
+# pack_task pickles arguments with the highest protocol that every
+# supported Python version can read.
+TASK_PICKLE_PROTOCOL = 4
+
 if PY3:
     buffer = memoryview
 
@@ -99,6 +103,16 @@ def serialize_object(obj, buffer_threshold=MAX_BYTES, item_threshold=MAX_ITEMS):
     -------
     [bufs] : list of buffers representing the serialized object.
     """
+    cobj, buffers = _can_object(obj, buffer_threshold, item_threshold)
+    buffers.insert(0, pickle.dumps(cobj, PICKLE_PROTOCOL))
+    return buffers
+
+
+def _can_object(obj, buffer_threshold, item_threshold):
+    """Can an object, extracting buffers larger than buffer_threshold.
+
+    Returns the canned object and the list of extracted buffers.
+    """
     buffers = []
     if istype(obj, sequence_types) and len(obj) < item_threshold:
         cobj = can_sequence(obj)
@@ -113,9 +127,25 @@ def serialize_object(obj, buffer_threshold=MAX_BYTES, item_threshold=MAX_ITEMS):
     else:
         cobj = can(obj)
         buffers.extend(_extract_buffers(cobj, buffer_threshold))
+    return cobj, buffers
 
-    buffers.insert(0, pickle.dumps(cobj, PICKLE_PROTOCOL))
-    return buffers
+
+def _uncan_object(canned, buffers, g=None):
+    """Invert _can_object, taking extracted buffers from the front of buffers."""
+    if istype(canned, sequence_types):
+        for c in canned:
+            _restore_buffers(c, buffers)
+        return uncan_sequence(canned, g)
+    elif istype(canned, dict):
+        newobj = {}
+        for k in sorted(canned):
+            c = canned[k]
+            _restore_buffers(c, buffers)
+            newobj[k] = uncan(c, g)
+        return newobj
+    else:
+        _restore_buffers(canned, buffers)
+        return uncan(canned, g)
 
 
 def deserialize_object(buffers, g=None):
@@ -212,3 +242,61 @@ def unpack_apply_message(bufs, g=None, copy=True):
     assert not kwarg_bufs, "Shouldn't be any kwarg bufs left over"
 
     return f, args, kwargs
+
+
+def pack_function(f):
+    """Serialize a function into a single buffer for pack_task.
+
+    The result can be reused for every task which calls the same function.
+    """
+    return pickle.dumps(can(f), PICKLE_PROTOCOL)
+
+
+def pack_task(f_buf, args, kwargs, buffer_threshold=MAX_BYTES, item_threshold=MAX_ITEMS):
+    """Pack up a serialized function, args, and kwargs to be sent over the wire.
+
+    Arguments are canned like pack_apply_message, but are then pickled together
+    in a single call rather than one pickle per argument. Buffers larger than
+    buffer_threshold are left out of the pickle and sent as buffers of their own.
+
+    Message will be a list of bytes/buffers of the format:
+
+    [ f_buf, cargs, <arg_bufs> ]
+
+    where f_buf is the output of pack_function.
+    """
+    buffers = []
+    cargs = []
+    for arg in args:
+        c, bufs = _can_object(arg, buffer_threshold, item_threshold)
+        cargs.append(c)
+        buffers.extend(bufs)
+
+    # kwargs are kept as a sorted list so that buffers are restored in the same
+    # order on every Python version
+    ckwargs = []
+    for key in sorted(kwargs):
+        c, bufs = _can_object(kwargs[key], buffer_threshold, item_threshold)
+        ckwargs.append((key, c))
+        buffers.extend(bufs)
+
+    msg = [f_buf, pickle.dumps((cargs, ckwargs), TASK_PICKLE_PROTOCOL)]
+    msg.extend(buffers)
+    return msg
+
+
+def unpack_task(bufs, g=None):
+    """Unpack f,args,kwargs from buffers packed by pack_task().
+
+    Returns: original f,args,kwargs
+    """
+    assert len(bufs) >= 2, "not enough buffers!"
+    f = uncan(pickle.loads(bufs[0]), g)
+    cargs, ckwargs = pickle.loads(bufs[1])
+    buffers = list(bufs[2:])
+
+    args = tuple(_uncan_object(c, buffers, g) for c in cargs)
+    kwargs = {key: _uncan_object(c, buffers, g) for key, c in ckwargs}
+    assert not buffers, "Shouldn't be any buffers left over"
+
+    return f, args, kwargs
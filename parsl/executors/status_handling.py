@@ -7,6 +7,13 @@ from typing import List, Any, Dict
 from parsl.executors.base import ParslExecutor
 from parsl.providers.provider_base import JobStatus, ExecutionProvider
 
+try:
+    from concurrent.futures import InvalidStateError
+except ImportError:
+    # Before Python 3.8, completing a future twice does not raise
+    class InvalidStateError(Exception):  # type: ignore
+        pass
+
 
 logger = logging.getLogger(__name__)
 
@@ -67,9 +74,15 @@ class StatusHandlingExecutor(ParslExecutor):
         # Set bad state to prevent new tasks from being submitted
         self._executor_bad_state.set()
         # We set all current tasks to this exception to make sure that
-        # this is raised in the main context.
-        for task in self._tasks:
-            self._tasks[task].set_exception(Exception(str(self._executor_exception)))
+        # this is raised in the main context. Iterate over a copy, as executors
+        # may remove tasks from _tasks from another thread as they complete.
+        for fut in list(self._tasks.values()):
+            if not fut.done():
+                try:
+                    fut.set_exception(Exception(str(self._executor_exception)))
+                except InvalidStateError:
+                    # The task completed after it was checked
+                    pass
 
     @property
     def bad_state_is_set(self):
@@ -0,0 +1,50 @@
+import pytest
+
+from parsl.app.app import python_app
+from parsl.channels import LocalChannel
+from parsl.config import Config
+from parsl.executors import ExtremeScaleExecutor
+from parsl.launchers import SimpleLauncher
+from parsl.providers import LocalProvider
+
+local_config = Config(
+    executors=[
+        ExtremeScaleExecutor(
+            label="Extreme_Local_Prefetch",
+            worker_debug=True,
+            ranks_per_node=4,
+            worker_prefetch=True,
+            provider=LocalProvider(
+                channel=LocalChannel(),
+                init_blocks=1,
+                max_blocks=1,
+                launcher=SimpleLauncher(),
+            )
+        )
+    ],
+    strategy=None,
+)
+
+
+@python_app(executors=['Extreme_Local_Prefetch'])
+def square(x):
+    return x * x
+
+
+@python_app(executors=['Extreme_Local_Prefetch'])
+def fail(x):
+    raise ValueError(x)
+
+
+@pytest.mark.local
+def test_prefetch(n=50):
+    """Workers which prefetch their next task run every task once"""
+    futures = [square(i) for i in range(n)]
+    assert [f.result() for f in futures] == [i * i for i in range(n)]
+
+
+@pytest.mark.local
+def test_prefetch_exception():
+    """Exceptions from tasks are returned by workers which prefetch"""
+    with pytest.raises(ValueError):
+        fail(1).result()
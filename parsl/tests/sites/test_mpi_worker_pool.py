@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+pytest.importorskip("mpi4py")
+
+from parsl.executors.extreme_scale.mpi_worker_pool import Manager  # noqa: E402
+
+
+def make_manager(worker_count, worker_prefetch):
+    """Builds a Manager without connecting to an interchange or to MPI ranks"""
+    manager = Manager.__new__(Manager)
+    manager.worker_count = worker_count
+    manager.worker_prefetch = worker_prefetch
+    return manager
+
+
+@pytest.mark.local
+def test_reg_message_without_prefetch():
+    msg = json.loads(make_manager(3, False).create_reg_message().decode('utf-8'))
+    assert msg['worker_count'] == 3
+    assert msg['prefetch_capacity'] == 0
+    assert msg['max_capacity'] == 3
+
+
+@pytest.mark.local
+def test_reg_message_with_prefetch():
+    """With prefetch, each worker may hold one task beyond the one it runs"""
+    msg = json.loads(make_manager(3, True).create_reg_message().decode('utf-8'))
+    assert msg['worker_count'] == 3
+    assert msg['prefetch_capacity'] == 3
+    assert msg['max_capacity'] == 6
@@ -0,0 +1,42 @@
+import pytest
+
+import parsl
+from parsl.app.app import python_app
+from parsl.tests.configs.htex_local import fresh_config
+
+
+def local_setup():
+    config = fresh_config()
+    config.executors[0].batch_size = 7
+    config.executors[0].batch_period = 5
+    parsl.load(config)
+
+
+def local_teardown():
+    parsl.clear()
+
+
+@python_app
+def double(x):
+    return x * 2
+
+
+@pytest.mark.local
+def test_batched_submission(n=100):
+    """Tasks spread across several partial batches all complete"""
+    futures = [double(i) for i in range(n)]
+    assert [f.result() for f in futures] == [i * 2 for i in range(n)]
+
+
+@python_app
+def first_byte(x):
+    return bytes(x[:1])
+
+
+@pytest.mark.local
+def test_argument_modified_after_submit():
+    """Large buffer arguments are copied at submit, not when their batch is sent"""
+    data = bytearray(b'a' * (2 * 1024 * 1024))
+    future = first_byte(memoryview(data))
+    data[0:1] = b'Z'
+    assert future.result() == b'a'
@@ -0,0 +1,18 @@
+from parsl.app.app import python_app
+
+
+@python_app
+def get_length(x):
+    return len(x)
+
+
+def test_large_bytes_arg():
+    """Bytes arguments larger than the 1MB buffer threshold are sent out of band"""
+    data = b'x' * (2 * 1024 * 1024)
+    assert get_length(data).result() == len(data)
+
+
+def test_large_memoryview_arg():
+    """Buffers which cannot be pickled can still be passed as large arguments"""
+    data = memoryview(b'y' * (2 * 1024 * 1024))
+    assert get_length(data).result() == len(data)
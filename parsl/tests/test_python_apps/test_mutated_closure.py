@@ -0,0 +1,17 @@
+from parsl.app.app import python_app
+
+
+def test_mutated_closure():
+    """Changes to values captured by an app are seen when it is submitted again"""
+    offset = 1
+    scale = [10]
+
+    @python_app
+    def shift(x):
+        return x * scale[0] + offset
+
+    assert shift(2).result() == 21
+
+    offset = 5
+    scale[0] = 100
+    assert shift(2).result() == 205
@@ -0,0 +1,55 @@
+from operator import add
+
+import pytest
+
+from parsl.executors.high_throughput.executor import BUFFER_THRESHOLD, ITEM_THRESHOLD
+from parsl.executors.serialize import pack_function, pack_task, unpack_task
+
+
+# add is a builtin, which is pickled by reference, so these tests do not depend
+# on rebuilding code objects, which varies between Python versions
+def round_trip(args, kwargs):
+    bufs = pack_task(pack_function(add), args, kwargs,
+                     buffer_threshold=BUFFER_THRESHOLD, item_threshold=ITEM_THRESHOLD)
+    f, new_args, new_kwargs = unpack_task(bufs)
+    return bufs, f, new_args, new_kwargs
+
+
+@pytest.mark.local
+def test_small_args():
+    bufs, f, args, kwargs = round_trip((1, 'a', [2, 3]), {})
+    assert len(bufs) == 2, "Small arguments should be pickled with the task"
+    assert args == (1, 'a', [2, 3])
+    assert kwargs == {}
+    assert f(1, 2) == 3
+
+
+@pytest.mark.local
+def test_kwargs():
+    bufs, f, args, kwargs = round_trip((1,), {'y': 2, 'b': 'x', 'a': None})
+    assert len(bufs) == 2
+    assert args == (1,)
+    assert kwargs == {'y': 2, 'b': 'x', 'a': None}
+    assert f(*args, kwargs['y']) == 3
+
+
+@pytest.mark.local
+def test_large_buffer():
+    data = b'x' * (BUFFER_THRESHOLD + 1)
+    small = b'y' * 10
+    bufs, f, args, kwargs = round_trip((small, data), {'z': data})
+    assert len(bufs) == 4, "Buffers over the threshold should be sent on their own"
+    assert bufs[2] is data and bufs[3] is data
+    assert bytes(args[0]) == small
+    assert bytes(args[1]) == data
+    assert bytes(kwargs['z']) == data
+
+
+@pytest.mark.local
+def test_memoryview():
+    small = memoryview(b'a' * 10)
+    large = memoryview(b'b' * (BUFFER_THRESHOLD + 1))
+    bufs, f, args, kwargs = round_trip((small,), {'y': large})
+    assert len(bufs) == 3
+    assert bytes(args[0]) == bytes(small)
+    assert bytes(kwargs['y']) == bytes(large)